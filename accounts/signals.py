@@ -9,9 +9,11 @@ def create_user_profile(sender, instance, created, **kwargs):
         UserProfile.objects.create(user=instance)
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    """Сохраняет профиль при сохранении пользователя"""
-    if hasattr(instance, 'userprofile'):
-        instance.userprofile.save()
-    else:
+def save_user_profile(sender, instance, update_fields=None, **kwargs):
+    """Создает профиль, если его нет (например, у старых пользователей)"""
+    # Точечные сохранения (last_login при входе) профиль не касаются.
+    # Существующий профиль не пересохраняем: он не зависит от полей User
+    if update_fields:
+        return
+    if not hasattr(instance, 'userprofile'):
         UserProfile.objects.create(user=instance)
\ No newline at end of file
@@ -0,0 +1,27 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from accounts.models import UserProfile
+
+User = get_user_model()
+
+
+class ProfileViewTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="tester", password="12345")
+        self.client.login(username="tester", password="12345")
+
+    def test_profile_page(self):
+        response = self.client.get(reverse("accounts:profile"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["profile"].user_id, self.user.pk)
+
+    def test_profile_created_if_missing(self):
+        """Профиль создаётся при первом открытии страницы"""
+        UserProfile.objects.filter(user=self.user).delete()
+
+        response = self.client.get(reverse("accounts:profile"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(UserProfile.objects.filter(user=self.user).exists())
@@ -47,23 +47,24 @@ class TransactionViewSet(viewsets.ModelViewSet):
         if start_date:
             queryset = queryset.filter(date__gte=start_date)
 
-        # Подсчет статистики
-        income = queryset.filter(type='income').aggregate(
-            total=Sum('amount')
-        )['total'] or Decimal('0')
-
-        expense = queryset.filter(type='expense').aggregate(
-            total=Sum('amount')
-        )['total'] or Decimal('0')
-
+        # Подсчет статистики — одним запросом
+        stats = queryset.aggregate(
+            income=Sum('amount', filter=Q(type='income')),
+            expense=Sum('amount', filter=Q(type='expense')),
+            transactions_count=Count('id'),
+            categories_count=Count('category', distinct=True),
+            uncategorized_count=Count('id', filter=Q(category__isnull=True)),
+            avg_transaction=Avg('amount'),
+        )
+
+        income = stats['income'] or Decimal('0')
+        expense = stats['expense'] or Decimal('0')
         balance = income - expense
 
-        transactions_count = queryset.count()
-        categories_count = queryset.values('category').distinct().count()
-
-        avg_transaction = queryset.aggregate(
-            avg=Avg('amount')
-        )['avg'] or Decimal('0')
+        transactions_count = stats['transactions_count']
+        # Транзакции без категории считаются отдельной группой, как и раньше
+        categories_count = stats['categories_count'] + (1 if stats['uncategorized_count'] else 0)
+        avg_transaction = stats['avg_transaction'] or Decimal('0')
 
         data = {
             'total_income': income,
@@ -9,18 +9,28 @@ class TransactionForm(forms.ModelForm):
     class Meta:
         model = Transaction
         fields = ["type", "amount", "category", "card", "date", "description"]
+        widgets = {
+            "type": forms.Select(attrs={"class": "form-select"}),
+            "amount": forms.NumberInput(attrs={"class": "form-control"}),
+            "category": forms.Select(attrs={"class": "form-select"}),
+            "card": forms.Select(attrs={"class": "form-select"}),
+            "date": forms.DateInput(attrs={"class": "form-control"}),
+            "description": forms.Textarea(attrs={"class": "form-control"}),
+        }
 
     def __init__(self, *args, **kwargs):
         user = kwargs.pop("user")  # <-- правильно забираем user ДО super()
         super().__init__(*args, **kwargs)
 
-        # Фильтр карт пользователя
-        self.fields["card"].queryset = Card.objects.filter(user=user)
+        # Фильтр карт пользователя (только поля, нужные для подписи в <select>)
+        self.fields["card"].queryset = Card.objects.filter(user=user).only(
+            "id", "card_number", "card_system"
+        )
 
         self.fields["card"].empty_label = "Наличными / Без карты"
 
         # Фильтр категорий
-        categories = Category.objects.filter(user=user, is_active=True)
+        categories = Category.objects.filter(user=user, is_active=True).only("id", "name", "type")
 
         tx_type = None
 
@@ -36,14 +46,6 @@ class TransactionForm(forms.ModelForm):
 
         self.fields["category"].queryset = categories.order_by("name")
 
-        # Стилизация
-        for field in self.fields.values():
-            field.widget.attrs.update({"class": "form-control"})
-
-        self.fields["type"].widget.attrs["class"] = "form-select"
-        self.fields["category"].widget.attrs["class"] = "form-select"
-        self.fields["card"].widget.attrs["class"] = "form-select"
-
         # Дата по умолчанию
         if not self.instance.pk:
             self.fields["date"].initial = date.today()
@@ -106,9 +108,9 @@ class TransactionFilterForm(forms.Form):
         widget=forms.Select(attrs={'class': 'form-select'})
     )
 
-    category = forms.ModelChoiceField(
+    category = forms.ChoiceField(
         label='Категория',
-        queryset=Category.objects.none(),
+        choices=[('', '---------')],
         required=False,
         widget=forms.Select(attrs={'class': 'form-select'})
     )
@@ -126,7 +128,15 @@ class TransactionFilterForm(forms.Form):
         super().__init__(*args, **kwargs)
 
         if user:
-            self.fields['category'].queryset = Category.objects.filter(
+            # Готовые (id, подпись) одним запросом: без обхода queryset при рендере и валидации
+            self.fields['category'].choices = [('', '---------')] + self._category_choices(user)
+
+    @staticmethod
+    def _category_choices(user):
+        # Подпись — Category.__str__, как у ModelChoiceField
+        return [
+            (category.pk, str(category))
+            for category in Category.objects.filter(
                 user=user, is_active=True
-            )
-
+            ).only('id', 'name', 'type')
+        ]
@@ -108,6 +108,12 @@ class Transaction(models.Model):
         verbose_name = 'Транзакция'
         verbose_name_plural = 'Транзакции'
         ordering = ['-date', '-created_at']
+        indexes = [
+            # Дашборд и список: фильтр по пользователю, типу и диапазону дат
+            models.Index(fields=['user', 'type', 'date']),
+            # Последние транзакции пользователя (ORDER BY date DESC)
+            models.Index(fields=['user', 'date']),
+        ]
 
     def __str__(self):
         return f"{self.category} - {self.amount}"
@@ -2,6 +2,9 @@ from django.test import TestCase
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
+from transactions.models import Transaction, Category
+from decimal import Decimal
+from datetime import date
 
 User = get_user_model()
 
@@ -17,3 +20,22 @@ class TransactionAPITest(TestCase):
         url = reverse("api:transactions-list")
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
+
+    def test_api_statistics(self):
+        category = Category.objects.create(user=self.user, name="Еда", type="expense")
+        Transaction.objects.create(
+            user=self.user, type="income", amount=Decimal("1000.00"), date=date.today()
+        )
+        Transaction.objects.create(
+            user=self.user, category=category, type="expense", amount=Decimal("200.00"), date=date.today()
+        )
+
+        url = reverse("api:transactions-statistics")
+        response = self.client.get(url, {"period": "all"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(response.data["total_income"]), Decimal("1000.00"))
+        self.assertEqual(Decimal(response.data["total_expense"]), Decimal("200.00"))
+        self.assertEqual(response.data["transactions_count"], 2)
+        # доход без категории — отдельная группа
+        self.assertEqual(response.data["categories_count"], 2)
+        self.assertEqual(Decimal(response.data["avg_transaction"]), Decimal("600.00"))
@@ -2,6 +2,7 @@ from django.test import TestCase
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from transactions.models import Transaction, Category
+from cards.models import Card
 from decimal import Decimal
 from datetime import date
 
@@ -17,7 +18,7 @@ class TransactionListViewTest(TestCase):
         )
         self.client.login(username="tester", password="12345")
 
-        category = Category.objects.create(
+        self.category = Category.objects.create(
             user=self.user,
             name="Продукты",
             type="expense",
@@ -26,7 +27,7 @@ class TransactionListViewTest(TestCase):
 
         Transaction.objects.create(
             user=self.user,
-            category=category,
+            category=self.category,
             type="expense",
             amount=Decimal("300.00"),
             date=date.today()
@@ -42,3 +43,235 @@ class TransactionListViewTest(TestCase):
         response = self.client.get(url)
         self.assertContains(response, "300")
 
+    def test_list_view_reuses_filter_form(self):
+        """Форма фильтра создаётся один раз и попадает в контекст"""
+        url = reverse("transactions:list")
+        response = self.client.get(url, {"type": "income"})
+        self.assertIs(response.context["filter_form"], response.context["view"].filter_form)
+        self.assertEqual(response.context["total_expense"], Decimal("0"))
+        self.assertEqual(len(response.context["transactions"]), 0)
+
+    def test_list_view_filter_by_category(self):
+        """Категории фильтра читаются из БД на каждый запрос и сразу видят изменения"""
+        url = reverse("transactions:list")
+        response = self.client.get(url, {"category": self.category.pk})
+        self.assertEqual(len(response.context["transactions"]), 1)
+        self.assertIn(
+            (self.category.pk, str(self.category)),
+            response.context["filter_form"].fields["category"].choices
+        )
+
+        Category.objects.create(user=self.user, name="Зарплата", type="income")
+        response = self.client.get(url)
+        labels = [label for _, label in response.context["filter_form"].fields["category"].choices]
+        self.assertIn("Зарплата (Доход)", labels)
+
+    def test_list_view_inactive_category_not_offered(self):
+        """Отключённая категория сразу пропадает из фильтра и не проходит валидацию"""
+        url = reverse("transactions:list")
+        self.client.get(url)
+        Category.objects.filter(pk=self.category.pk).update(is_active=False)
+
+        response = self.client.get(url, {"category": self.category.pk})
+        self.assertFalse(response.context["filter_form"].is_valid())
+        self.assertNotIn(
+            (self.category.pk, str(self.category)),
+            response.context["filter_form"].fields["category"].choices
+        )
+
+
+class DashboardViewTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="tester",
+            password="12345"
+        )
+        self.client.login(username="tester", password="12345")
+
+        self.category = Category.objects.create(
+            user=self.user,
+            name="Продукты",
+            type="expense",
+            color="#00ff00"
+        )
+
+        Transaction.objects.create(
+            user=self.user,
+            type="income",
+            amount=Decimal("1000.00"),
+            date=date.today()
+        )
+        Transaction.objects.create(
+            user=self.user,
+            category=self.category,
+            type="expense",
+            amount=Decimal("300.00"),
+            date=date.today()
+        )
+
+    def test_dashboard_totals(self):
+        """Доходы и расходы считаются одним агрегатом"""
+        response = self.client.get(reverse("transactions:dashboard"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["income"], Decimal("1000.00"))
+        self.assertEqual(response.context["expense"], Decimal("300.00"))
+
+    def test_dashboard_recommendations_from_aggregates(self):
+        """Средний чек и число категорий берутся из общего агрегата"""
+        Transaction.objects.create(
+            user=self.user,
+            category=self.category,
+            type="expense",
+            amount=Decimal("9700.00"),
+            date=date.today()
+        )
+        response = self.client.get(reverse("transactions:dashboard"))
+        recommendations = response.context["ai_recommendations"]
+        self.assertTrue(any("Средняя трата составляет 5000" in r for r in recommendations))
+        self.assertTrue(any("одной категории" in r for r in recommendations))
+
+    def test_dashboard_without_transactions(self):
+        """Пустой период: только агрегат итогов, без группировки и списка"""
+        Transaction.objects.filter(user=self.user).delete()
+
+        # сессия, пользователь, карты, агрегат итогов
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("transactions:dashboard"))
+
+        self.assertEqual(response.context["ai_recommendations"], ["Отлично! Ваши траты выглядят сбалансировано 😊"])
+        self.assertEqual(response.context["recent_transactions"], [])
+
+    def test_dashboard_data_json(self):
+        """JSON-эндпоинт отдаёт те же итоги, что и страница"""
+        Transaction.objects.create(
+            user=self.user,
+            type="expense",
+            amount=Decimal("50.00"),
+            date=date.today()
+        )
+        response = self.client.get(reverse("transactions:dashboard_data"), {"period": "year"})
+        self.assertEqual(response.status_code, 200)
+
+        data = response.json()
+        self.assertEqual(data["period"], "year")
+        self.assertEqual(data["income"], 1000.0)
+        self.assertEqual(data["expense"], 350.0)
+        # Расходы без категории подписаны так же, как в API графика категорий
+        self.assertEqual(data["labels"], ["Продукты", "Без категории"])
+        self.assertEqual(data["colors"], ["#00ff00", "#6c757d"])
+        self.assertEqual(data["values"], [300.0, 50.0])
+        self.assertEqual(len(data["recent_transactions"]), 3)
+
+    def test_dashboard_data_balance_matches_page(self):
+        """Баланс в JSON считается так же, как на странице"""
+        Card.objects.create(
+            user=self.user,
+            card_number="2200 0000 0000 0002",
+            card_holder="TESTER",
+            card_type="debit",
+            balance=Decimal("150.00"),
+            expiry_date=date(2030, 1, 1)
+        )
+        page = self.client.get(reverse("transactions:dashboard"))
+        data = self.client.get(reverse("transactions:dashboard_data")).json()
+        self.assertEqual(page.context["balance"], Decimal("150.00"))
+        self.assertEqual(data["balance"], 150.0)
+
+
+class TransactionCardBalanceTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="tester",
+            password="12345"
+        )
+        self.client.login(username="tester", password="12345")
+
+        self.category = Category.objects.create(
+            user=self.user,
+            name="Продукты",
+            type="expense",
+            color="#00ff00"
+        )
+        self.card = Card.objects.create(
+            user=self.user,
+            card_number="2200 0000 0000 0001",
+            card_holder="TESTER",
+            card_type="debit",
+            balance=Decimal("1000.00"),
+            expiry_date=date(2030, 1, 1)
+        )
+
+    def post_transaction(self, url, amount, card=None):
+        return self.client.post(url, {
+            "type": "expense",
+            "amount": amount,
+            "category": self.category.pk,
+            "card": card.pk if card else "",
+            "date": date.today().isoformat(),
+            "description": "",
+        })
+
+    def test_create_updates_balance(self):
+        self.post_transaction(reverse("transactions:add"), "300.00", card=self.card)
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal("700.00"))
+
+    def test_update_applies_net_delta(self):
+        self.post_transaction(reverse("transactions:add"), "300.00", card=self.card)
+        transaction = Transaction.objects.get(user=self.user)
+
+        self.post_transaction(reverse("transactions:edit", args=[transaction.pk]), "500.00", card=self.card)
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal("500.00"))
+
+        self.post_transaction(reverse("transactions:edit", args=[transaction.pk]), "500.00")
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal("1000.00"))
+
+    def test_delete_rolls_back_balance(self):
+        self.post_transaction(reverse("transactions:add"), "300.00", card=self.card)
+        transaction = Transaction.objects.get(user=self.user)
+
+        self.client.post(reverse("transactions:delete", args=[transaction.pk]))
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal("1000.00"))
+        self.assertFalse(Transaction.objects.filter(pk=transaction.pk).exists())
+
+    def test_delete_foreign_transaction_forbidden(self):
+        """Чужую транзакцию удалить нельзя, баланс карты не меняется"""
+        self.post_transaction(reverse("transactions:add"), "300.00", card=self.card)
+        transaction = Transaction.objects.get(user=self.user)
+
+        User.objects.create_user(username="intruder", password="12345")
+        self.client.login(username="intruder", password="12345")
+        response = self.client.post(reverse("transactions:delete", args=[transaction.pk]))
+        self.assertEqual(response.status_code, 404)
+
+        self.client.logout()
+        response = self.client.post(reverse("transactions:delete", args=[transaction.pk]))
+        self.assertEqual(response.status_code, 302)
+
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal("700.00"))
+        self.assertTrue(Transaction.objects.filter(pk=transaction.pk).exists())
+
+    def test_dashboard_balance_follows_card_changes(self):
+        """Баланс по всем картам (страница и JSON) следует за созданием, правкой и удалением"""
+        def balances():
+            page = self.client.get(reverse("transactions:dashboard"))
+            data = self.client.get(reverse("transactions:dashboard_data")).json()
+            return page.context["balance"], Decimal(str(data["balance"]))
+
+        self.assertEqual(balances(), (Decimal("1000.00"), Decimal("1000.00")))
+
+        self.post_transaction(reverse("transactions:add"), "300.00", card=self.card)
+        self.assertEqual(balances(), (Decimal("700.00"), Decimal("700.00")))
+
+        transaction = Transaction.objects.get(user=self.user)
+        self.post_transaction(reverse("transactions:edit", args=[transaction.pk]), "500.00", card=self.card)
+        self.assertEqual(balances(), (Decimal("500.00"), Decimal("500.00")))
+
+        self.client.post(reverse("transactions:delete", args=[transaction.pk]))
+        self.assertEqual(balances(), (Decimal("1000.00"), Decimal("1000.00")))
@@ -12,6 +12,7 @@ app_name = 'transactions'
 urlpatterns = [
     # Dashboard
     path('', views.DashboardView.as_view(), name='dashboard'),
+    path('dashboard/data/', views.DashboardDataView.as_view(), name='dashboard_data'),
 
     # Transactions
     path('list/', views.TransactionListView.as_view(), name='list'),
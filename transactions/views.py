@@ -1,9 +1,12 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.views import View
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, TemplateView
 from django.urls import reverse_lazy
 from django.contrib import messages
-from django.db.models import Sum, Q
+from django.db import transaction as db_transaction
+from django.db.models import Sum, Avg, F, Q, Value
+from django.db.models.functions import Coalesce
 from datetime import datetime, timedelta
 from decimal import Decimal
 from .models import Transaction, Category, Budget
@@ -13,16 +16,28 @@ from cards.models import Card
 from django.http import JsonResponse
 
 
-class DashboardView(LoginRequiredMixin, TemplateView):
-    template_name = 'transactions/dashboard.html'
+def _sum_amount(**filters):
+    """Условная сумма по amount для aggregate(); 0 вместо NULL"""
+    return Coalesce(Sum('amount', filter=Q(**filters)), Value(Decimal('0')))
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
 
-        user = self.request.user
-        today = datetime.now().date()
+def _signed_amount(tx_type, amount):
+    """Влияние транзакции на баланс карты: доход +, расход -"""
+    return amount if tx_type == 'income' else -amount
 
-        # ===== ПЕРИОД =====
+
+def _change_card_balance(user_id, card_id, delta):
+    """Изменяет баланс карты одним UPDATE без чтения строки"""
+    if card_id and delta:
+        Card.objects.filter(pk=card_id, user_id=user_id).update(balance=F('balance') + delta)
+
+
+class DashboardDataMixin:
+    """Общие расчёты дашборда для HTML-страницы и JSON-эндпоинта"""
+
+    def get_period(self):
+        """Возвращает (period, start_date, title) по параметру ?period="""
+        today = datetime.now().date()
         period = self.request.GET.get("period", "month")
 
         if period == "week":
@@ -32,78 +47,96 @@ class DashboardView(LoginRequiredMixin, TemplateView):
             start_date = today.replace(month=1, day=1)
             title = "Статистика за текущий год"
         else:
+            period = "month"
             start_date = today.replace(day=1)
             title = "Статистика за текущий месяц"
 
-        context["period"] = period
-        context["period_title"] = title
-
-        # ===== КАРТЫ =====
-        cards = Card.objects.filter(user=user)
-        context["cards"] = cards
+        return period, start_date, title
 
+    def get_card_id(self):
         card_id = self.request.GET.get("card")
-        selected_card = None
+        return int(card_id) if card_id and card_id.isdigit() else None
 
-        if card_id and card_id.isdigit():
-            selected_card = cards.filter(id=card_id).first()
+    def get_cards(self):
+        """Карты пользователя одним запросом: нужны и для фильтра, и для баланса"""
+        cards = list(
+            Card.objects.filter(user=self.request.user).only("id", "bank_name", "card_number", "balance")
+        )
+        card_id = self.get_card_id()
+        selected_card = next((c for c in cards if c.id == card_id), None)
+        return cards, selected_card
 
-        context["selected_card"] = selected_card
+    def get_balance(self, cards, selected_card):
+        if selected_card:
+            return selected_card.balance
+        return sum((c.balance for c in cards), Decimal("0"))
 
-        # ===== ТРАНЗАКЦИИ (УЧЁТ КАРТЫ) =====
+    def get_transactions(self, start_date, card_id=None):
         transactions = Transaction.objects.filter(
-            user=user,
+            user=self.request.user,
             date__gte=start_date,
-            date__lte=today
+            date__lte=datetime.now().date()
         )
 
-        if selected_card:
-            transactions = transactions.filter(card=selected_card)
-
-        # ===== ДОХОДЫ / РАСХОДЫ =====
-        income = transactions.filter(type='income').aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        expense = transactions.filter(type='expense').aggregate(total=Sum('amount'))['total'] or Decimal('0')
+        if card_id:
+            transactions = transactions.filter(card_id=card_id)
 
-        # ===== БАЛАНС =====
-        if selected_card:
-            balance = selected_card.balance
-        else:
-            balance = cards.aggregate(total=Sum("balance"))["total"] or Decimal("0")
+        return transactions
 
-        # ===== ПОСЛЕДНИЕ ТРАНЗАКЦИИ =====
-        recent_transactions = transactions.order_by('-date')[:10]
-
-        context.update({
-            "income": income,
-            "expense": expense,
-            "balance": balance,
-            "recent_transactions": recent_transactions,
-        })
+    def get_stats(self, transactions):
+        """Итоги, график категорий и рекомендации — два запроса"""
+        # ===== ДОХОДЫ / РАСХОДЫ (один запрос) =====
+        week_ago = datetime.now().date() - timedelta(days=7)
+        totals = transactions.aggregate(
+            income=_sum_amount(type='income'),
+            expense=_sum_amount(type='expense'),
+            week_expense=_sum_amount(type='expense', date__gte=week_ago),
+            avg_expense=Avg('amount', filter=Q(type='expense')),
+        )
+        income = totals['income']
+        expense = totals['expense']
 
         # ===== ГРАФИК КАТЕГОРИЙ =====
-        category_data = (
+        # Один запрос: те же данные нужны рекомендациям (топ-категория, число категорий).
+        # Нет расходов — нечего группировать, запрос не нужен
+        category_data = list(
             transactions.filter(type="expense")
             .values("category__name", "category__color")
             .annotate(total=Sum("amount"))
-        )
+            .order_by("-total")
+        ) if expense else []
 
-        context["chart_labels"] = [c["category__name"] for c in category_data]
-        context["chart_values"] = [float(c["total"]) for c in category_data]
-        context["chart_colors"] = [c["category__color"] or "#cccccc" for c in category_data]
+        labels, values, colors = zip(*(
+            # Подписи и цвета — как в _get_category_chart_data API, который строит categoryChart
+            (c["category__name"] or "Без категории", float(c["total"]), c["category__color"] or "#6c757d")
+            for c in category_data
+        )) if category_data else ((), (), ())
 
         # ===== AI РЕКОМЕНДАЦИИ =====
-        context["ai_recommendations"] = self.generate_ai_recommendations(
-            user=user,
-            transactions=transactions,
+        recommendations = self.generate_ai_recommendations(
+            user=self.request.user,
+            category_data=category_data,
             income=income,
-            expense=expense
+            expense=expense,
+            week_expense=totals['week_expense'],
+            avg_expense=totals['avg_expense'],
         )
 
-        return context
-
+        # Шаблон выводит графики как JS-массивы, поэтому именно list, а не tuple
+        return {
+            "income": income,
+            "expense": expense,
+            "chart_labels": list(labels),
+            "chart_values": list(values),
+            "chart_colors": list(colors),
+            "ai_recommendations": recommendations,
+        }
 
+    def generate_ai_recommendations(self, user, category_data, income, expense, week_expense, avg_expense):
+        # Нет транзакций за период (например, новый пользователь) — анализировать нечего
+        if not income and not expense:
+            return ["Отлично! Ваши траты выглядят сбалансировано 😊"]
 
-    def generate_ai_recommendations(self, user, transactions, income, expense):
         recommendations = []
 
         # 1. Превышение расходов над доходами
@@ -113,50 +146,29 @@ class DashboardView(LoginRequiredMixin, TemplateView):
             )
 
         # 2. Категория с максимальными расходами
-        top_cat = (
-            transactions.filter(type="expense")
-            .values("category__name")
-            .annotate(total=Sum("amount"))
-            .order_by("-total")
-            .first()
-        )
-        if top_cat:
+        if category_data:
+            top_cat = category_data[0]
             recommendations.append(
                 f"Больше всего вы тратите на «{top_cat['category__name']}» — {float(top_cat['total']):.0f} ₽."
             )
 
         # 3. Быстрый рост расходов за неделю
-        week_ago = datetime.now().date() - timedelta(days=7)
-        week_expense = (
-                transactions.filter(type="expense", date__gte=week_ago)
-                .aggregate(total=Sum("amount"))["total"]
-                or 0
-        )
-
         if week_expense > 0 and week_expense > (expense * Decimal("0.5")):
             recommendations.append(
                 "Более 50% ваших расходов за период пришлись на последние 7 дней — расходы растут слишком быстро."
             )
 
         # 4. Средний чек
-        expenses_list = [
-            float(t.amount) for t in transactions.filter(type="expense")
-        ]
-        if expenses_list:
-            avg = sum(expenses_list) / len(expenses_list)
+        if avg_expense is not None:
+            avg = float(avg_expense)
             if avg > 3000:
                 recommendations.append(
                     f"Средняя трата составляет {avg:.0f} ₽ — это довольно высоко. Попробуйте снизить количество крупных покупок."
                 )
 
         # 5. Низкая диверсификация категорий
-        categories_count = (
-            transactions.filter(type="expense")
-            .values("category")
-            .distinct()
-            .count()
-        )
-        if categories_count == 1:
+        # (расходы без категории — отдельная группа, как и в API статистики)
+        if len(category_data) == 1:
             recommendations.append(
                 "Все ваши расходы сосредоточены в одной категории — это риск несбалансированности бюджета."
             )
@@ -168,6 +180,90 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         return recommendations
 
 
+class DashboardView(LoginRequiredMixin, DashboardDataMixin, TemplateView):
+    template_name = 'transactions/dashboard.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+
+        # ===== ПЕРИОД =====
+        period, start_date, title = self.get_period()
+
+        context["period"] = period
+        context["period_title"] = title
+
+        # ===== КАРТЫ =====
+        cards, selected_card = self.get_cards()
+        context["cards"] = cards
+        context["selected_card"] = selected_card
+
+        # ===== ТРАНЗАКЦИИ (УЧЁТ КАРТЫ) =====
+        transactions = self.get_transactions(start_date, selected_card.id if selected_card else None)
+
+        # ===== БАЛАНС =====
+        balance = self.get_balance(cards, selected_card)
+
+        stats = self.get_stats(transactions)
+
+        # ===== ПОСЛЕДНИЕ ТРАНЗАКЦИИ =====
+        if stats["income"] or stats["expense"]:
+            recent_transactions = transactions.select_related('category', 'card').order_by('-date')[:10]
+        else:
+            recent_transactions = []
+
+        context.update({
+            "balance": balance,
+            "recent_transactions": recent_transactions,
+        })
+        context.update(stats)
+
+        return context
+
+
+class DashboardDataView(LoginRequiredMixin, DashboardDataMixin, View):
+    """Данные дашборда в JSON для смены периода/карты без перезагрузки страницы"""
+
+    def get(self, request, *args, **kwargs):
+        period, start_date, title = self.get_period()
+
+        # ===== БАЛАНС (тот же источник, что и у страницы) =====
+        cards, selected_card = self.get_cards()
+        card_id = selected_card.id if selected_card else None
+        balance = self.get_balance(cards, selected_card)
+
+        transactions = self.get_transactions(start_date, card_id)
+        stats = self.get_stats(transactions)
+
+        if stats["income"] or stats["expense"]:
+            recent_transactions = transactions.select_related('category').order_by('-date')[:10]
+        else:
+            recent_transactions = []
+
+        return JsonResponse({
+            "period": period,
+            "period_title": title,
+            "card": card_id,
+            "income": float(stats["income"]),
+            "expense": float(stats["expense"]),
+            "balance": float(balance),
+            "labels": stats["chart_labels"],
+            "values": stats["chart_values"],
+            "colors": stats["chart_colors"],
+            "recommendations": stats["ai_recommendations"],
+            "recent_transactions": [
+                {
+                    "date": t.date.strftime("%d.%m.%Y"),
+                    "type": t.type,
+                    "amount": float(t.amount),
+                    "category": t.category.name if t.category else None,
+                    "icon": t.category.icon if t.category else None,
+                    "color": t.category.color if t.category else None,
+                }
+                for t in recent_transactions
+            ],
+        })
+
+
 class TransactionListView(LoginRequiredMixin, ListView):
     """Список всех транзакций"""
     model = Transaction
@@ -176,29 +272,38 @@ class TransactionListView(LoginRequiredMixin, ListView):
     paginate_by = 20
 
     def get_queryset(self):
-        queryset = Transaction.objects.filter(user=self.request.user)
-
-        form = TransactionFilterForm(self.request.GET, user=self.request.user)
-        if form.is_valid():
-            if form.cleaned_data.get('type'):
-                queryset = queryset.filter(type=form.cleaned_data['type'])
-            if form.cleaned_data.get('category'):
-                queryset = queryset.filter(category=form.cleaned_data['category'])
-            if form.cleaned_data.get('date_from'):
-                queryset = queryset.filter(date__gte=form.cleaned_data['date_from'])
-            if form.cleaned_data.get('date_to'):
-                queryset = queryset.filter(date__lte=form.cleaned_data['date_to'])
-
-        return queryset
+        # ListView и get_context_data работают с одним и тем же queryset
+        if hasattr(self, '_qs'):
+            return self._qs
+
+        queryset = Transaction.objects.filter(user=self.request.user).select_related('category', 'card')
+
+        self.filter_form = TransactionFilterForm(self.request.GET, user=self.request.user)
+        if self.filter_form.is_valid():
+            cleaned_data = self.filter_form.cleaned_data
+            if cleaned_data.get('type'):
+                queryset = queryset.filter(type=cleaned_data['type'])
+            if cleaned_data.get('category'):
+                queryset = queryset.filter(category=cleaned_data['category'])
+            if cleaned_data.get('date_from'):
+                queryset = queryset.filter(date__gte=cleaned_data['date_from'])
+            if cleaned_data.get('date_to'):
+                queryset = queryset.filter(date__lte=cleaned_data['date_to'])
+
+        self._qs = queryset
+        return self._qs
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        queryset = self.get_queryset()
 
-        income = queryset.filter(type='income').aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        expense = queryset.filter(type='expense').aggregate(total=Sum('amount'))['total'] or Decimal('0')
+        totals = self.object_list.aggregate(
+            income=_sum_amount(type='income'),
+            expense=_sum_amount(type='expense'),
+        )
+        income = totals['income']
+        expense = totals['expense']
 
-        context['filter_form'] = TransactionFilterForm(self.request.GET, user=self.request.user)
+        context['filter_form'] = self.filter_form
         context['total_income'] = income
         context['total_expense'] = expense
         context['balance'] = income - expense
@@ -217,17 +322,16 @@ class TransactionCreateView(LoginRequiredMixin, CreateView):
         kwargs["user"] = self.request.user
         return kwargs
 
+    @db_transaction.atomic
     def form_valid(self, form):
         form.instance.user = self.request.user
         response = super().form_valid(form)
 
-        card = form.instance.card
-        if card:
-            if form.instance.type == 'income':
-                card.balance += form.instance.amount
-            else:
-                card.balance -= form.instance.amount
-            card.save()
+        _change_card_balance(
+            form.instance.user_id,
+            form.instance.card_id,
+            _signed_amount(form.instance.type, form.instance.amount)
+        )
 
         return response
 
@@ -255,48 +359,51 @@ class TransactionUpdateView(LoginRequiredMixin, UpdateView):
         kwargs['user'] = self.request.user
         return kwargs
 
-    def form_valid(self, form):
-        old_transaction = self.get_object()
-        old_card = old_transaction.card
+    def get_object(self, queryset=None):
+        obj = super().get_object(queryset)
+        # Снимок до привязки формы: ModelForm меняет instance при валидации
+        self.original_state = (obj.type, obj.amount, obj.card_id)
+        return obj
 
-        # Откат старой транзакции
-        if old_card:
-            if old_transaction.type == 'income':
-                old_card.balance -= old_transaction.amount
-            else:
-                old_card.balance += old_transaction.amount
-            old_card.save()
+    @db_transaction.atomic
+    def form_valid(self, form):
+        old_type, old_amount, old_card_id = self.original_state
+        old_delta = _signed_amount(old_type, old_amount)
 
         response = super().form_valid(form)
 
-        new_card = form.instance.card
-        if new_card:
-            if form.instance.type == 'income':
-                new_card.balance += form.instance.amount
-            else:
-                new_card.balance -= form.instance.amount
-            new_card.save()
+        new_card_id = form.instance.card_id
+        new_delta = _signed_amount(form.instance.type, form.instance.amount)
+
+        # Откат старой транзакции и применение новой
+        user_id = form.instance.user_id
+        if old_card_id == new_card_id:
+            _change_card_balance(user_id, new_card_id, new_delta - old_delta)
+        else:
+            _change_card_balance(user_id, old_card_id, -old_delta)
+            _change_card_balance(user_id, new_card_id, new_delta)
 
         return response
 
 
-class TransactionDeleteView(DeleteView):
+class TransactionDeleteView(LoginRequiredMixin, DeleteView):
     model = Transaction
     template_name = 'transactions/transaction_confirm_delete.html'
     success_url = reverse_lazy('transactions:list')
 
-    def delete(self, request, *args, **kwargs):
-        transaction = self.get_object()
-        card = transaction.card
-
-        if card:
-            if transaction.type == "income":
-                card.balance -= transaction.amount
-            else:
-                card.balance += transaction.amount
-            card.save()
+    def get_queryset(self):
+        # Удалять (и менять баланс карты) можно только свои транзакции
+        return Transaction.objects.filter(user=self.request.user)
 
-        return super().delete(request, *args, **kwargs)
+    @db_transaction.atomic
+    def form_valid(self, form):
+        # Django 4+ удаляет объект в form_valid(), а не в delete()
+        _change_card_balance(
+            self.object.user_id,
+            self.object.card_id,
+            -_signed_amount(self.object.type, self.object.amount)
+        )
+        return super().form_valid(form)
 
 
 